@@ -1,5 +1,4 @@
 from typing import Dict, List, Tuple
-import itertools
 import math
 import numpy as np
 from allennlp.data import Tokenizer, DatasetReader, TokenIndexer, Instance, Token
@@ -7,8 +6,6 @@ from allennlp.data.tokenizers import PretrainedTransformerTokenizer
 from allennlp.data.fields import TextField, TensorField, MetadataField, LabelField, ListField
 from transformers.models.luke.tokenization_luke import LukeTokenizer
 
-from seqeval.scheme import Entities, IOB1, Entity
-
 NON_ENTITY = "O"
 
 
@@ -36,9 +33,9 @@ def parse_conll_ner_data(input_file: str, encoding: str = "utf-8"):
                     if len(words) != sentence_boundaries[-1]:
                         sentence_boundaries.append(len(words))
                 else:
-                    parts = line.split(" ")
-                    words.append(parts[0])
-                    labels.append(parts[-1])
+                    # only the first (word) and the last (label) columns are used
+                    words.append(line.split(" ", 1)[0])
+                    labels.append(line.rsplit(" ", 1)[-1])
 
         if words:
             yield words, labels, sentence_boundaries
@@ -46,6 +43,46 @@ def parse_conll_ner_data(input_file: str, encoding: str = "utf-8"):
         raise Exception("The specified encoding seems wrong. Try either ISO-8859-1 or utf-8.") from e
 
 
+def extract_iob1_spans(labels: List[str]) -> List[Tuple[int, int, str]]:
+    """
+    Extract (start, end, tag) spans from IOB1 labels in a single pass.
+    This follows the same rules as ``seqeval.scheme.Entities`` with ``IOB1``
+    without creating objects for every label.
+    Unlike seqeval, which raises ``KeyError`` for unknown prefix letters (e.g., "X-PER"),
+    any prefix other than I, O, and B raises ``ValueError``.
+    """
+    prefixes = [label[0] for label in labels] + ["O"]
+    tags = [label[1:].strip("-") or "_" for label in labels] + ["_"]
+    for label, prefix in zip(labels, prefixes):
+        if prefix not in "IOB":
+            raise ValueError(f"Invalid token is found: {label}. Allowed prefixes are: I|O|B.")
+
+    spans: List[Tuple[int, int, str]] = []
+    prev_prefix, prev_tag = "O", "_"
+    i = 0
+    while i < len(prefixes):
+        prefix, tag = prefixes[i], tags[i]
+        same_tag = prev_tag == tag
+        if prefix == "I":
+            is_start = prev_prefix != "I" or not same_tag
+        else:
+            is_start = prefix == "B" and prev_prefix != "O" and same_tag
+
+        if not is_start:
+            i += 1
+        else:
+            end = i + 1
+            while prefixes[end] == "I" and tags[end] == tags[end - 1]:
+                end += 1
+            # seqeval's IOB1 end patterns only accept (B, B) with the same tag,
+            # so a single-token "B-X" chunk directly followed by "B-Y" is never closed and is dropped
+            if not (end == i + 1 and prefix == "B" and prefixes[end] == "B" and tags[end] != tag):
+                spans.append((i, end, tag))
+            i = end
+        prev_prefix, prev_tag = prefixes[i - 1], tags[i - 1]
+    return spans
+
+
 def check_add_prefix_space(tokenizer: Tokenizer):
     """
     Because tokenization is performed on words,
@@ -79,6 +116,7 @@ class ConllSpanReader(DatasetReader):
         self.max_num_subwords = max_sequence_length - 2  # take the number of Special tokens into account
         self.max_entity_length = max_entity_length
         self.max_mention_length = max_mention_length
+        self._mention_offsets = np.arange(max_mention_length)
 
         self.encoding = encoding
         self.use_entity_feature = use_entity_feature
@@ -88,101 +126,162 @@ class ConllSpanReader(DatasetReader):
         else:
             self.entity_id = 1
 
+        # special tokens are added to each split of the sequence if the tokenizer supports them
+        if isinstance(self.tokenizer, PretrainedTransformerTokenizer):
+            self._add_special_tokens = self.tokenizer.add_special_tokens
+        else:
+            self._add_special_tokens = None
+
+        # words are tokenized independently, so the results can be shared across occurrences
+        self._tokenize_cache: Dict[str, List[Token]] = {}
+        # fast tokenizers can process all the pre-split words of a document in a single call
+        # (only when the words are tokenized without special tokens and truncation)
+        self._use_batch_tokenization = (
+            isinstance(self.tokenizer, PretrainedTransformerTokenizer)
+            and self.tokenizer.tokenizer.is_fast
+            and not self.tokenizer._add_special_tokens
+            and self.tokenizer._max_length is None
+        )
+
+    def _batch_tokenize(self, words: List[str]) -> List[List[Token]]:
+        """
+        Tokenize the words with a fast tokenizer at once and group the subwords by word,
+        producing the same tokens as ``PretrainedTransformerTokenizer.tokenize`` does for each word.
+        This assumes the tokenizer is configured with ``add_special_tokens=False`` and no ``max_length``.
+        """
+        transformer_tokenizer = self.tokenizer.tokenizer
+        encoded = transformer_tokenizer(
+            words,
+            is_split_into_words=True,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_token_type_ids=True,
+            verbose=False,
+        )
+        token_ids = encoded["input_ids"]
+        texts = transformer_tokenizer.convert_ids_to_tokens(token_ids)
+
+        tokens: List[List[Token]] = [[] for _ in words]
+        for word_index, text, token_id, type_id, (start, end) in zip(
+            encoded.word_ids(), texts, token_ids, encoded["token_type_ids"], encoded["offset_mapping"]
+        ):
+            if start >= end:
+                start = end = None
+            tokens[word_index].append(Token(text=text, text_id=token_id, type_id=type_id, idx=start, idx_end=end))
+        return tokens
+
     def data_to_instance(self, words: List[str], labels: List[str], sentence_boundaries: List[int], doc_index: str):
         if self.tokenizer is None:
             tokens = [[Token(w)] for w in words]
+        elif self._use_batch_tokenization:
+            tokens = self._batch_tokenize(words)
         else:
-            tokens = [self.tokenizer.tokenize(w) for w in words]
+            tokens = []
+            for w in words:
+                word_tokens = self._tokenize_cache.get(w)
+                if word_tokens is None:
+                    word_tokens = self._tokenize_cache[w] = self.tokenizer.tokenize(w)
+                tokens.append(word_tokens)
         subwords = [sw for token in tokens for sw in token]
 
-        subword2token = list(itertools.chain(*[[i] * len(token) for i, token in enumerate(tokens)]))
-        token2subword = [0] + list(itertools.accumulate(len(token) for token in tokens))
-        subword_start_positions = frozenset(token2subword)
-        subword_sentence_boundaries = [sum(len(token) for token in tokens[:p]) for p in sentence_boundaries]
+        token_lengths = np.fromiter((len(token) for token in tokens), dtype=np.int64, count=len(tokens))
+        subword2token = np.repeat(np.arange(len(tokens)), token_lengths)
+        token2subword = np.concatenate([[0], np.cumsum(token_lengths)])
+        is_start = np.zeros(len(subwords) + 1, dtype=bool)
+        is_start[token2subword] = True
+        subword_sentence_boundaries = token2subword[sentence_boundaries].tolist()
 
         # extract entities from IOB tags
         # we need to pass sentence by sentence
-        entities: List[Entity] = []
+        span_to_entity_label: Dict[Tuple[int, int], str] = dict()
         for s, e in zip(sentence_boundaries[:-1], sentence_boundaries[1:]):
-            for ent in Entities([labels[s:e]], scheme=IOB1).entities[0]:
-                ent.start += s
-                ent.end += s
-                entities.append(ent)
+            for ent_start, ent_end, tag in extract_iob1_spans(labels[s:e]):
+                span_to_entity_label[(int(token2subword[ent_start + s]), int(token2subword[ent_end + s]))] = tag
 
-        span_to_entity_label: Dict[Tuple[int, int], str] = dict()
-        for ent in entities:
-            subword_start = token2subword[ent.start]
-            subword_end = token2subword[ent.end]
-            span_to_entity_label[(subword_start, subword_end)] = ent.tag
+        # pack (start, end) into single integers to match the entity spans in bulk
+        entity_spans = np.array(list(span_to_entity_label), dtype=np.int64).reshape(-1, 2)
+        entity_span_keys = (entity_spans[:, 0] << 32) | entity_spans[:, 1]
+
+        max_num_subwords = self.max_num_subwords
+        max_entity_length = self.max_entity_length
+        mention_lengths = self._mention_offsets + 1
+        add_special_tokens = self._add_special_tokens
 
         # split data according to sentence boundaries
         for n in range(len(subword_sentence_boundaries) - 1):
             # process (sub) words
             doc_sent_start, doc_sent_end = subword_sentence_boundaries[n : n + 2]
-            assert doc_sent_end - doc_sent_start < self.max_num_subwords
+            assert doc_sent_end - doc_sent_start < max_num_subwords
 
             left_length = doc_sent_start
             right_length = len(subwords) - doc_sent_end
             sentence_length = doc_sent_end - doc_sent_start
-            half_context_length = int((self.max_num_subwords - sentence_length) / 2)
+            half_context_length = int((max_num_subwords - sentence_length) / 2)
 
             if left_length < right_length:
                 left_context_length = min(left_length, half_context_length)
-                right_context_length = min(right_length, self.max_num_subwords - left_context_length - sentence_length)
+                right_context_length = min(right_length, max_num_subwords - left_context_length - sentence_length)
             else:
                 right_context_length = min(right_length, half_context_length)
-                left_context_length = min(left_length, self.max_num_subwords - right_context_length - sentence_length)
+                left_context_length = min(left_length, max_num_subwords - right_context_length - sentence_length)
 
             doc_offset = doc_sent_start - left_context_length
             word_ids = subwords[doc_offset : doc_sent_end + right_context_length]
 
-            if isinstance(self.tokenizer, PretrainedTransformerTokenizer):
-                word_ids = self.tokenizer.add_special_tokens(word_ids)
+            if add_special_tokens is not None:
+                word_ids = add_special_tokens(word_ids)
 
             # process entities
-            entity_start_positions = []
-            entity_end_positions = []
-            entity_ids = []
-            entity_position_ids = []
-            original_entity_spans = []
-            labels = []
-
-            for entity_start in range(left_context_length, left_context_length + sentence_length):
-                doc_entity_start = entity_start + doc_offset
-                if doc_entity_start not in subword_start_positions:
-                    continue
-                for entity_end in range(entity_start + 1, left_context_length + sentence_length + 1):
-                    doc_entity_end = entity_end + doc_offset
-                    if doc_entity_end not in subword_start_positions:
-                        continue
-
-                    if entity_end - entity_start > self.max_mention_length:
-                        continue
-
-                    entity_start_positions.append(entity_start + 1)
-                    entity_end_positions.append(entity_end)
-                    entity_ids.append(self.entity_id)
-
-                    position_ids = list(range(entity_start + 1, entity_end + 1))
-                    position_ids += [-1] * (self.max_mention_length - entity_end + entity_start)
-                    entity_position_ids.append(position_ids)
-
-                    original_entity_spans.append(
-                        (subword2token[doc_entity_start], subword2token[doc_entity_end - 1] + 1)
-                    )
-                    labels.append(span_to_entity_label.pop((doc_entity_start, doc_entity_end), NON_ENTITY))
+            # enumerate all the spans up to max_mention_length starting and ending at word boundaries
+            # within the sentence (ordered by the start position first and then by the end position)
+            start_candidates = np.flatnonzero(is_start[doc_sent_start:doc_sent_end]) + doc_sent_start
+            end_candidates = start_candidates[:, None] + mention_lengths
+            span_mask = (end_candidates <= doc_sent_end) & is_start[np.minimum(end_candidates, doc_sent_end)]
+            doc_span_starts = np.broadcast_to(start_candidates[:, None], span_mask.shape)[span_mask]
+            doc_span_ends = end_candidates[span_mask]
+            span_starts = doc_span_starts - doc_offset
+            span_ends = doc_span_ends - doc_offset
+
+            num_spans = len(span_starts)
+            entity_start_positions = span_starts + 1
+            entity_end_positions = span_ends
+
+            if self.use_entity_feature:
+                entity_ids = np.full(num_spans, self.entity_id, dtype=np.int64)
+                # padded (num_spans, max_mention_length) matrix of the positions covered by each span
+                entity_position_ids = np.where(
+                    self._mention_offsets < (span_ends - span_starts)[:, None],
+                    entity_start_positions[:, None] + self._mention_offsets,
+                    -1,
+                )
+
+            original_entity_spans = np.stack(
+                [subword2token[doc_span_starts], subword2token[doc_span_ends - 1] + 1], axis=1
+            )
+
+            # only look up the labels of the spans matching entities
+            labels = [NON_ENTITY] * num_spans
+            entity_span_indices = np.flatnonzero(np.isin((doc_span_starts << 32) | doc_span_ends, entity_span_keys))
+            for index, doc_entity_start, doc_entity_end in zip(
+                entity_span_indices.tolist(),
+                doc_span_starts[entity_span_indices].tolist(),
+                doc_span_ends[entity_span_indices].tolist(),
+            ):
+                labels[index] = span_to_entity_label.pop((doc_entity_start, doc_entity_end))
 
             # split instances
-            split_size = math.ceil(len(entity_ids) / self.max_entity_length)
-            for i in range(split_size):
-                entity_size = math.ceil(len(entity_ids) / split_size)
-                start = i * entity_size
+            # the entity arrays are built once per sentence, so the fields can share them as views
+            if num_spans == 0:
+                continue
+            split_size = math.ceil(num_spans / max_entity_length)
+            entity_size = math.ceil(num_spans / split_size)
+            for start in range(0, num_spans, entity_size):
                 end = start + entity_size
                 fields = {
                     "word_ids": TextField(word_ids, token_indexers=self.token_indexers),
-                    "entity_start_positions": TensorField(np.array(entity_start_positions[start:end])),
-                    "entity_end_positions": TensorField(np.array(entity_end_positions[start:end])),
-                    "original_entity_spans": TensorField(np.array(original_entity_spans[start:end]), padding_value=-1),
+                    "entity_start_positions": TensorField(entity_start_positions[start:end]),
+                    "entity_end_positions": TensorField(entity_end_positions[start:end]),
+                    "original_entity_spans": TensorField(original_entity_spans[start:end], padding_value=-1),
                     "labels": ListField([LabelField(l) for l in labels[start:end]]),
                     "doc_id": MetadataField(doc_index),
                     "input_words": MetadataField(words),
@@ -191,8 +290,8 @@ class ConllSpanReader(DatasetReader):
                 if self.use_entity_feature:
                     fields.update(
                         {
-                            "entity_ids": TensorField(np.array(entity_ids[start:end]), padding_value=0),
-                            "entity_position_ids": TensorField(np.array(entity_position_ids[start:end])),
+                            "entity_ids": TensorField(entity_ids[start:end], padding_value=0),
+                            "entity_position_ids": TensorField(entity_position_ids[start:end]),
                         }
                     )
 
@@ -0,0 +1,108 @@
+import itertools
+
+import pytest
+from allennlp.data.tokenizers import PretrainedTransformerTokenizer
+from seqeval.scheme import Entities, IOB1
+from tokenizers import BertWordPieceTokenizer, ByteLevelBPETokenizer
+from transformers import BertConfig, BertTokenizerFast, RobertaConfig, RobertaTokenizerFast
+
+from examples_allennlp.ner.reader import ConllSpanReader, extract_iob1_spans, parse_conll_ner_data
+
+corpus = ["EU rejects German call to boycott British lamb .", "Peter Blackburn BRUSSELS 1996-08-22 naïve , ..."]
+words = ["EU", "rejects", "German", "", "...", ",", "(", "naïve", "1996-08-22", "Blackburn"]
+
+
+def seqeval_iob1_spans(labels):
+    return [(ent.start, ent.end, ent.tag) for ent in Entities([labels], scheme=IOB1).entities[0]]
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [
+        [],
+        ["O", "I-PER", "I-PER", "O"],
+        ["I-PER", "B-PER", "I-PER"],
+        ["I-PER", "B-LOC", "I-LOC"],
+        ["B-PER", "B-PER"],
+        ["B-PER", "B-LOC", "O"],
+        ["O", "B-PER", "I-PER"],
+        ["I", "B", "I", "O"],
+        ["I-", "I-", "B-", "O"],
+        ["I-PER", "I-LOC", "O", "I-PER"],
+    ],
+)
+def test_extract_iob1_spans(labels):
+    assert extract_iob1_spans(labels) == seqeval_iob1_spans(labels)
+
+
+def test_extract_iob1_spans_exhaustive():
+    vocab = ["O", "I-PER", "B-PER", "I-LOC", "B-LOC", "I", "B-"]
+    for length in range(5):
+        for labels in itertools.product(vocab, repeat=length):
+            labels = list(labels)
+            assert extract_iob1_spans(labels) == seqeval_iob1_spans(labels), labels
+
+
+def test_extract_iob1_spans_invalid_prefix():
+    with pytest.raises(ValueError):
+        seqeval_iob1_spans(["O", "E-PER"])
+    with pytest.raises(ValueError):
+        extract_iob1_spans(["O", "E-PER"])
+    # seqeval raises KeyError for unknown prefix letters
+    with pytest.raises(ValueError):
+        extract_iob1_spans(["X-PER"])
+
+
+def test_parse_conll_ner_data(tmp_path):
+    conll_file = tmp_path / "test.txt"
+    conll_file.write_bytes(
+        b"-DOCSTART- -X- O O\n\n"
+        b"EU NNP B-NP I-ORG\xa0\n"
+        b"rejects VBZ B-VP O\r\r\n"
+        b"German JJ B-NP I-MISC\n\n"
+        b"-DOCSTART- -X- O O\n\n"
+        b"Peter NNP B-NP I-PER\n\n"
+    )
+    documents = list(parse_conll_ner_data(str(conll_file), encoding="ISO-8859-1"))
+    assert documents == [
+        (["EU", "rejects", "German"], ["I-ORG", "O", "I-MISC"], [0, 2, 3]),
+        (["Peter"], ["I-PER"], [0, 1]),
+    ]
+
+
+def build_wordpiece_tokenizer(model_dir):
+    trainer = BertWordPieceTokenizer()
+    trainer.train_from_iterator(corpus, vocab_size=100)
+    trainer.save_model(str(model_dir))
+    BertTokenizerFast(str(model_dir / "vocab.txt"), do_lower_case=False).save_pretrained(str(model_dir))
+    BertConfig(vocab_size=100).save_pretrained(str(model_dir))
+    return {}
+
+
+def build_byte_level_bpe_tokenizer(model_dir):
+    trainer = ByteLevelBPETokenizer()
+    trainer.train_from_iterator(corpus, vocab_size=300, special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"])
+    trainer.save_model(str(model_dir))
+    RobertaTokenizerFast(str(model_dir / "vocab.json"), str(model_dir / "merges.txt")).save_pretrained(str(model_dir))
+    RobertaConfig(vocab_size=300).save_pretrained(str(model_dir))
+    return {"add_prefix_space": True}
+
+
+@pytest.mark.parametrize("build_tokenizer", [build_wordpiece_tokenizer, build_byte_level_bpe_tokenizer])
+def test_batch_tokenize(tmp_path, build_tokenizer):
+    tokenizer_kwargs = build_tokenizer(tmp_path)
+    tokenizer = PretrainedTransformerTokenizer(
+        str(tmp_path), add_special_tokens=False, tokenizer_kwargs=tokenizer_kwargs
+    )
+    reader = ConllSpanReader(token_indexers={}, tokenizer=tokenizer)
+
+    assert reader._use_batch_tokenization
+    assert reader._batch_tokenize(words) == [tokenizer.tokenize(w) for w in words]
+
+
+def test_batch_tokenize_disabled_with_special_tokens(tmp_path):
+    build_wordpiece_tokenizer(tmp_path)
+    tokenizer = PretrainedTransformerTokenizer(str(tmp_path), add_special_tokens=True)
+    reader = ConllSpanReader(token_indexers={}, tokenizer=tokenizer)
+
+    assert not reader._use_batch_tokenization